@@ -3,8 +3,11 @@
 # The AI remembers previous messages by including them in each API call.
 
 import os
+import sys
 from dotenv import load_dotenv
 import anthropic
+import response_cache
+from chat_helpers import CACHED_SYSTEM, with_cache_breakpoints, trim, enable_input_history
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,9 +17,23 @@ client = anthropic.Anthropic(
     api_key=os.environ.get("ANTHROPIC_API_KEY"),
 )
 
+# Look this up once instead of on every turn of the chat loop
+_stream = client.messages.stream
+
 # Model to use
 MODEL = "claude-sonnet-4-5-20250929"
 
+# Line editing and arrow-key recall for input()
+enable_input_history()
+
+# Temperature for the replies (low = more focused and repeatable answers)
+TEMPERATURE = 0.1
+
+# Semantic response cache, turn it off with: python chat.py --no-cache
+# (the cache loads a local embedding model, which takes a few seconds at startup
+# and downloads about 90MB the first time; it is loaded in the background)
+USE_CACHE = "--no-cache" not in sys.argv
+
 # Just for printing better logs in terminal
 def print_separator():
     """Print a visual separator"""
@@ -32,6 +49,10 @@ def main():
     print("=" * 50)
     print()
 
+    # Load the response cache model while the user types the first message
+    if USE_CACHE:
+        response_cache.preload()
+
     # Initialize the conversation history
     # This list will store all messages to maintain context
     messages = []
@@ -67,19 +88,30 @@ def main():
             # This is the key part - we send ALL previous messages to maintain context
             print("\nClaude: ", end="", flush=True)
 
-            response = client.messages.create(
-                model=MODEL,
-                system="You are the founder of GrowthX, and your name is Udayan, and you always talk like Yoda!",
-                temperature=0.1,
-                max_tokens=1024,
-                messages=messages  # Send the entire conversation history
-            )
-
-            # Extract the assistant's response
-            assistant_message = response.content[0].text
+            # Check the semantic cache first, a near-identical conversation needs no API call
+            cache_key, assistant_message = response_cache.lookup(messages, TEMPERATURE) if USE_CACHE else (None, None)
+
+            if assistant_message is not None:
+                print(assistant_message, end="")
+            else:
+                # Stream the response so text is printed as soon as it arrives
+                with _stream(
+                    model=MODEL,
+                    system=CACHED_SYSTEM,
+                    temperature=TEMPERATURE,
+                    max_tokens=1024,
+                    messages=with_cache_breakpoints(trim(messages))  # History that fits the window, prefix cached
+                ) as stream:
+                    for text in stream.text_stream:
+                        print(text, end="", flush=True)
+
+                    # Extract the full assistant's response once streaming is done
+                    assistant_message = stream.get_final_message().content[0].text
+
+                # Remember this answer for similar conversations later
+                response_cache.store(cache_key, assistant_message)
 
-            # Print the response
-            print(assistant_message)
+            print()
             print()
 
             # IMPORTANT: Add the assistant's response to the conversation history
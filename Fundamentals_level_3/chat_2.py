@@ -2,12 +2,17 @@
 # This version saves conversations after each exchange and allows resuming previous chats
 
 import os
+import sys
 import json
 import uuid
+import sqlite3
+import orjson
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 import anthropic
+import response_cache
+from chat_helpers import CACHED_SYSTEM, with_cache_breakpoints, trim, enable_input_history, menu_input
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,24 +22,227 @@ client = anthropic.Anthropic(
     api_key=os.environ.get("ANTHROPIC_API_KEY"),
 )
 
+# Look these up once instead of on every turn of the chat loop
+_stream = client.messages.stream
+_now = datetime.now
+
 # Model to use
 MODEL = "claude-sonnet-4-5-20250929"
 
+# Line editing and arrow-key recall for input()
+enable_input_history()
+
+# Temperature for the replies (low = more focused and repeatable answers)
+TEMPERATURE = 0.2
+
+# Semantic response cache, turn it off with: python chat_2.py --no-cache
+# (the cache loads a local embedding model, which takes a few seconds at startup
+# and downloads about 90MB the first time; it is loaded in the background)
+USE_CACHE = "--no-cache" not in sys.argv
+
 # Directory to store conversations
 CONVERSATIONS_DIR = "conversations"
 
+# All conversations live in one SQLite database inside that directory
+DB_PATH = f"{CONVERSATIONS_DIR}/conversations.db"
+
+# Longest message shown in full by the 'history' command
+HISTORY_MAX_CHARS = 500
+
+# Database connection, opened once on first use (see get_db)
+_db = None
+
+# Set once conversations saved as files by older versions are in the database
+_files_imported = False
+
+# Set once the conversations directory is known to exist, so we only check it once
+_dir_ready = False
+
 def ensure_conversations_dir():
     """Create conversations directory if it doesn't exist"""
+    global _dir_ready
+    if _dir_ready:
+        return
     Path(CONVERSATIONS_DIR).mkdir(exist_ok=True)
+    _dir_ready = True
+
+def _preview(text, limit=100):
+    """Shorten text for display, keeping at most `limit` characters"""
+    return text if len(text) <= limit else f"{text[:limit]}..."
+
+def _format_timestamp(iso_timestamp):
+    """Turn '2024-01-01T10:30:15.123456' into '2024-01-01 10:30' without parsing it"""
+    return iso_timestamp[:16].replace("T", " ")
 
 def generate_conversation_id():
     """Generate a unique conversation ID"""
     return str(uuid.uuid4())[:8]  # Use first 8 characters for simplicity
 
-def save_conversation(conversation_id, messages, metadata=None):
-    """Save conversation to a JSON file after each exchange"""
+def open_db():
+    """Open the conversations database and create the tables if needed"""
     ensure_conversations_dir()
+    # isolation_level=None lets us control transactions ourselves with BEGIN / COMMIT
+    db = sqlite3.connect(DB_PATH, isolation_level=None)
+
+    # WAL lets reads and writes happen together, mmap + a bigger cache speed up reads
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA mmap_size=268435456")
+    db.execute("PRAGMA cache_size=-64000")
+    db.execute("PRAGMA temp_store=FILE")
+
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            created TEXT NOT NULL,
+            updated TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            created_fmt TEXT,
+            updated_fmt TEXT
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            conversation_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            ts TEXT,
+            PRIMARY KEY (conversation_id, seq)
+        );
+        CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations (updated DESC);
+    """)
+
+    return db
+
+def get_db():
+    """Get the conversations database, opened once and shared by every call"""
+    global _db, _files_imported
+    if _db is None:
+        _db = open_db()
+
+    # Bring in conversations saved as files by older versions, one time only
+    # (user_version is set to 1 in the same transaction as a successful import);
+    # if the import fails it is tried again on the next call
+    if not _files_imported:
+        try:
+            if _db.execute("PRAGMA user_version").fetchone()[0] < 1:
+                import_file_conversations(_db)
+            _files_imported = True
+        except sqlite3.Error as e:
+            print(f"[Could not import saved conversation files yet: {e}]")
+    return _db
+
+def import_file_conversations(db):
+    """Import conversations saved as files (.json snapshots or .jsonl logs) into the database"""
+    conversations = {}
+
+    # .json files first, so a .jsonl log (the complete record) wins when both exist
+    files = sorted(Path(CONVERSATIONS_DIR).glob("conversation_*.json*"), key=lambda f: f.suffix)
+    for file in files:
+        conversation_id = file.stem[len("conversation_"):]
+        try:
+            # orjson reads the raw bytes directly, much faster than the json module
+            with open(file, "rb") as f:
+                if file.suffix == ".jsonl":
+                    messages = [orjson.loads(line) for line in f if line.strip()]
+                    if not messages:
+                        continue
+                    created = messages[0].get("timestamp")
+                    updated = messages[-1].get("timestamp")
+                else:
+                    data = orjson.loads(f.read())
+                    messages = data["messages"]
+                    created = data["created_at"]
+                    updated = data["last_updated"]
+
+            # Build and check the rows here too, so a file with a broken message is skipped as a whole
+            rows = [
+                (conversation_id, seq, m["role"], m["content"], m.get("timestamp"))
+                for seq, m in enumerate(messages)
+            ]
+            if not all(isinstance(row[2], str) and isinstance(row[3], str) for row in rows):
+                continue
+
+            # Fall back to the file's modification time if timestamps are missing or not text
+            modified = datetime.fromtimestamp(file.stat().st_mtime).isoformat()
+            created = created if isinstance(created, str) and created else modified
+            updated = updated if isinstance(updated, str) and updated else modified
+            dates = (created, updated, _format_timestamp(created), _format_timestamp(updated))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            continue
+
+        conversations[conversation_id] = (rows, dates)
+
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        # Conversations already in the database are newer than their files, keep those
+        existing = {row[0] for row in db.execute("SELECT id FROM conversations")}
+        imported = 0
+        for conversation_id, (rows, (created, updated, created_fmt, updated_fmt)) in conversations.items():
+            if conversation_id in existing:
+                continue
+            db.execute(
+                """INSERT INTO conversations (id, created, updated, count, created_fmt, updated_fmt)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (conversation_id, created, updated, len(rows), created_fmt, updated_fmt)
+            )
+            db.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?)", rows)
+            imported += 1
+
+        # Mark the import as done, only if everything above worked
+        db.execute("PRAGMA user_version = 1")
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+
+    if imported:
+        print(f"[Imported {imported} saved conversations into {DB_PATH}]")
+
+def append_messages(conversation_id, new_messages):
+    """
+    Add new messages to the conversation after each exchange
+
+    Only the new rows are inserted, so a save costs the same no matter how
+    long the conversation already is.
+    """
+    db = get_db()
+    now = _now().isoformat()
+
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        row = db.execute("SELECT count FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        count = row[0] if row else 0
+
+        db.executemany(
+            "INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+            [
+                (conversation_id, count + i, m["role"], m["content"], m.get("timestamp"))
+                for i, m in enumerate(new_messages)
+            ]
+        )
+
+        created = new_messages[0].get("timestamp") or now
+        updated = new_messages[-1].get("timestamp") or now
+        # The menu dates are formatted here, once per save, so showing the menu needs no formatting
+        db.execute(
+            """INSERT INTO conversations (id, created, updated, count, created_fmt, updated_fmt)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET
+                   updated = excluded.updated,
+                   count = excluded.count,
+                   updated_fmt = excluded.updated_fmt""",
+            (conversation_id, created, updated, count + len(new_messages),
+             _format_timestamp(created), _format_timestamp(updated))
+        )
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+
+    print(f"[Auto-saved: {conversation_id}]")
 
+def save_conversation(conversation_id, messages, metadata=None):
+    """Export a full conversation snapshot to a readable JSON file"""
     conversation_data = {
         "conversation_id": conversation_id,
         "created_at": metadata.get("created_at") if metadata else datetime.now().isoformat(),
@@ -43,46 +251,48 @@ def save_conversation(conversation_id, messages, metadata=None):
         "messages": messages
     }
 
-    # Save to file
+    # Save to file (orjson writes UTF-8 bytes, so non-English text is kept as is)
     filename = f"{CONVERSATIONS_DIR}/conversation_{conversation_id}.json"
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(conversation_data, f, indent=2, ensure_ascii=False)
+    with open(filename, "wb") as f:
+        f.write(orjson.dumps(conversation_data, option=orjson.OPT_INDENT_2))
 
-    print(f"[Auto-saved: {conversation_id}]")
     return filename
 
 def load_conversation(conversation_id):
-    """Load a conversation from file"""
-    filename = f"{CONVERSATIONS_DIR}/conversation_{conversation_id}.json"
-    try:
-        with open(filename, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data["messages"], data
-    except FileNotFoundError:
+    """Load a conversation from the database"""
+    db = get_db()
+    row = db.execute(
+        "SELECT created FROM conversations WHERE id = ?", (conversation_id,)
+    ).fetchone()
+    if row is None:
         return None, None
 
-def list_conversations():
-    """List all saved conversations"""
-    ensure_conversations_dir()
-    conversations = []
-
-    # Get all conversation files
-    for file in Path(CONVERSATIONS_DIR).glob("conversation_*.json"):
-        try:
-            with open(file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                conversations.append({
-                    "id": data["conversation_id"],
-                    "created": data["created_at"],
-                    "updated": data["last_updated"],
-                    "messages": data["message_count"]
-                })
-        except:
-            continue
-
-    # Sort by last updated (most recent first)
-    conversations.sort(key=lambda x: x["updated"], reverse=True)
-    return conversations
+    messages = [
+        {"role": role, "content": content, "timestamp": ts}
+        for role, content, ts in db.execute(
+            "SELECT role, content, ts FROM messages WHERE conversation_id = ? ORDER BY seq",
+            (conversation_id,)
+        )
+    ]
+    metadata = {"conversation_id": conversation_id, "created_at": row[0]}
+    return messages, metadata
+
+def list_conversations(limit=5):
+    """List the most recently updated conversations"""
+    # The dates are stored already formatted, so showing the menu is just printing strings
+    rows = get_db().execute(
+        """SELECT id, created_fmt, updated_fmt, count FROM conversations
+           ORDER BY updated DESC LIMIT ?""",
+        (limit,)
+    )
+    return [
+        {"id": id, "created_fmt": created_fmt, "updated_fmt": updated_fmt, "messages": count}
+        for id, created_fmt, updated_fmt, count in rows
+    ]
+
+def count_conversations():
+    """Count all saved conversations"""
+    return get_db().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
 
 def display_conversation_menu():
     """Display menu for selecting conversations"""
@@ -95,17 +305,15 @@ def display_conversation_menu():
     if conversations:
         print("\nRecent Conversations:")
         print("-" * 50)
-        for i, conv in enumerate(conversations[:5], 1):  # Show only 5 most recent
-            # Parse and format the date
-            created = datetime.fromisoformat(conv["created"]).strftime("%Y-%m-%d %H:%M")
-            updated = datetime.fromisoformat(conv["updated"]).strftime("%Y-%m-%d %H:%M")
+        for i, conv in enumerate(conversations, 1):  # Only the 5 most recent are loaded
             print(f"{i}. ID: {conv['id']}")
-            print(f"   Created: {created} | Updated: {updated}")
+            print(f"   Created: {conv['created_fmt']} | Updated: {conv['updated_fmt']}")
             print(f"   Messages: {conv['messages']}")
             print()
 
-        if len(conversations) > 5:
-            print(f"   ... and {len(conversations) - 5} more conversations")
+        total = count_conversations()
+        if total > len(conversations):
+            print(f"   ... and {total - len(conversations)} more conversations")
             print()
 
         print("-" * 50)
@@ -125,7 +333,7 @@ def select_conversation():
 
     while True:
         try:
-            choice = input("\nSelect an option (number): ").strip()
+            choice = menu_input("\nSelect an option (number): ").strip()
 
             if choice == "0":
                 return None, None, None
@@ -149,8 +357,7 @@ def select_conversation():
                     # Show last message to give context
                     if messages:
                         last_msg = messages[-1]
-                        preview = last_msg["content"][:100] + "..." if len(last_msg["content"]) > 100 else last_msg["content"]
-                        print(f"   Last {last_msg['role']}: {preview}")
+                        print(f"   Last {last_msg['role']}: {_preview(last_msg['content'])}")
 
                     return conv["id"], messages, metadata
 
@@ -164,7 +371,7 @@ def chat_loop(conversation_id, messages, metadata):
     print("\n" + "=" * 50)
     print(f"CHAT SESSION - ID: {conversation_id}")
     print("=" * 50)
-    print("Commands: 'exit' to quit, 'history' to view history")
+    print("Commands: 'exit' to quit, 'history' to view history, 'compact' to export a JSON snapshot")
     print("=" * 50)
 
     # Show conversation context if resuming
@@ -174,10 +381,7 @@ def chat_loop(conversation_id, messages, metadata):
         recent = messages[-4:] if len(messages) >= 4 else messages
         for msg in recent:
             role_label = "You" if msg["role"] == "user" else "Claude"
-            content = msg["content"]
-            if len(content) > 150:
-                content = content[:150] + "..."
-            print(f"{role_label}: {content}")
+            print(f"{role_label}: {_preview(msg['content'], 150)}")
         print("--- Continue conversation below ---\n")
     else:
         print("\nStarting new conversation...\n")
@@ -193,61 +397,83 @@ def chat_loop(conversation_id, messages, metadata):
             break
 
         if user_input.lower() == 'history':
-            print("\n--- Full Conversation History ---")
+            # Build the whole history first and print it in one go (one write instead of one per message)
+            lines = ["\n--- Full Conversation History ---"]
             for i, msg in enumerate(messages, 1):
                 role_label = "You" if msg["role"] == "user" else "Claude"
-                print(f"{i}. {role_label}: {msg['content']}")
-            print("--- End of History ---\n")
+                content = msg["content"]
+                # Very long messages are cut so the history stays readable
+                if len(content) > HISTORY_MAX_CHARS:
+                    content = f"{content[:HISTORY_MAX_CHARS]} [truncated, {len(content) - HISTORY_MAX_CHARS} more chars]"
+                lines.append(f"{i}. {role_label}: {content}")
+            lines.append("--- End of History ---\n")
+            print("\n".join(lines))
+            continue
+
+        if user_input.lower() == 'compact':
+            # Rebuild the full JSON snapshot from the database
+            logged_messages, _ = load_conversation(conversation_id)
+            filename = save_conversation(conversation_id, logged_messages or [], metadata)
+            print(f"\n[Snapshot exported: {filename}]\n")
             continue
 
         # Skip empty inputs
         if not user_input:
             continue
 
+        # One timestamp for the whole exchange (user message + reply)
+        ts = _now().isoformat()
+
         # Add user message to conversation with metadata
+        # (the timestamp stays in history, with_cache_breakpoints sends only role and content to the API)
         user_message = {
             "role": "user",
             "content": user_input,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": ts
         }
-
-        # For API, we only need role and content
-        messages.append({
-            "role": "user",
-            "content": user_input
-        })
+        messages.append(user_message)
 
         try:
             # Make API call with full conversation history
             print("\nClaude: ", end="", flush=True)
 
-            response = client.messages.create(
-                model=MODEL,
-                max_tokens=1024,
-                system="You are the founder of GrowthX, and your name is Udayan, and you always talk like Yoda!",
-                temperature=0.2,
-                messages=messages  # Send entire conversation history
-            )
+            # Check the semantic cache first, a near-identical conversation needs no API call
+            cache_key, assistant_content = response_cache.lookup(messages, TEMPERATURE) if USE_CACHE else (None, None)
+
+            if assistant_content is not None:
+                print(assistant_content, end="")
+            else:
+                # Stream the response so text is printed as soon as it arrives
+                with _stream(
+                    model=MODEL,
+                    max_tokens=1024,
+                    system=CACHED_SYSTEM,
+                    temperature=TEMPERATURE,
+                    messages=with_cache_breakpoints(trim(messages))  # History that fits the window, prefix cached
+                ) as stream:
+                    for text in stream.text_stream:
+                        print(text, end="", flush=True)
+
+                    # Extract the full response once streaming is done
+                    assistant_content = stream.get_final_message().content[0].text
+
+                # Remember this answer for similar conversations later
+                response_cache.store(cache_key, assistant_content)
 
-            # Extract and display response
-            assistant_content = response.content[0].text
-            print(assistant_content)
+            print()
 
             # Add assistant message to history
             assistant_message = {
                 "role": "assistant",
                 "content": assistant_content,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": ts
             }
-
-            messages.append({
-                "role": "assistant",
-                "content": assistant_content
-            })
+            messages.append(assistant_message)
 
             # AUTO-SAVE after each successful user-assistant exchange
             # This is the key feature - persistence after each complete interaction
-            save_conversation(conversation_id, messages, metadata)
+            # Only the two new messages are appended, the rest is already on disk
+            append_messages(conversation_id, [user_message, assistant_message])
 
             print(f"\n[Messages in conversation: {len(messages)}]")
             print("-" * 50)
@@ -274,6 +500,13 @@ def main():
     print("  • Full conversation history preservation")
     print("=" * 60)
 
+    # Create the storage folder once, up front
+    ensure_conversations_dir()
+
+    # Load the response cache model while the user picks a conversation
+    if USE_CACHE:
+        response_cache.preload()
+
     while True:
         # Let user select or create a conversation
         conversation_id, messages, metadata = select_conversation()
@@ -287,7 +520,7 @@ def main():
 
         # Ask if user wants to continue with another conversation
         print("\n" + "-" * 50)
-        choice = input("Open another conversation? (yes/no): ").strip().lower()
+        choice = menu_input("Open another conversation? (yes/no): ").strip().lower()
         if choice != 'yes':
             print("\nGoodbye! All conversations have been saved.")
             break
@@ -303,12 +536,13 @@ if __name__ == "__main__":
     print("   Example: 'a1b2c3d4'")
     print()
     print("2. STORAGE FORMAT:")
-    print("   Messages are saved as JSON files")
-    print("   Location: ./conversations/conversation_{id}.json")
+    print("   Messages are saved as rows in a SQLite database")
+    print("   Location: ./conversations/conversations.db")
+    print("   Type 'compact' to export a full snapshot: conversation_{id}.json")
     print()
     print("3. AUTO-SAVE MECHANISM:")
     print("   After each user message + assistant response")
-    print("   Ensures no data loss")
+    print("   Only the 2 new messages are inserted, so saving stays fast")
     print()
     print("4. MESSAGE STRUCTURE:")
     print("   Each message contains:")
@@ -322,7 +556,7 @@ if __name__ == "__main__":
     print("=" * 60)
 
     # Show example JSON structure
-    print("\nExample Saved Conversation Structure:")
+    print("\nExample Exported Snapshot Structure:")
     print("-" * 60)
     example = {
         "conversation_id": "a1b2c3d4",
@@ -339,6 +573,6 @@ if __name__ == "__main__":
     print(json.dumps(example, indent=2))
     print("=" * 60)
 
-    input("\nPress Enter to start the chat application...")
+    menu_input("\nPress Enter to start the chat application...")
 
     main()
\ No newline at end of file
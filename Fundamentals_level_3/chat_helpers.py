@@ -0,0 +1,120 @@
+# Helpers shared by chat.py and chat_2.py for building each API request:
+# the system prompt, prompt-cache breakpoints, trimming history to the context window,
+# and input() line editing / history.
+
+import os
+import atexit
+from functools import lru_cache
+
+# System prompt, defined once so it can be marked as a cacheable prefix
+SYSTEM_PROMPT = "You are the founder of GrowthX, and your name is Udayan, and you always talk like Yoda!"
+
+# Prompt caching: the system prompt and the earlier turns are the same on every call,
+# so we mark them with cache_control and the API re-uses them instead of re-reading them.
+CACHED_SYSTEM = [
+    {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+]
+
+def with_cache_breakpoints(messages):
+    """Return a copy of messages with cache breakpoints on the last two user turns"""
+    request_messages = [{"role": m["role"], "content": m["content"]} for m in messages]
+    marked = 0
+    # Walk from the end so the breakpoints land on the newest user turns
+    for msg in reversed(request_messages):
+        if msg["role"] != "user" or not isinstance(msg["content"], str):
+            continue
+        msg["content"] = [
+            {"type": "text", "text": msg["content"], "cache_control": {"type": "ephemeral"}}
+        ]
+        marked += 1
+        if marked == 2:
+            break
+    return request_messages
+
+# Context window budget: Claude's window is 200K tokens, we stay a little under it
+CONTEXT_BUDGET = 180_000
+
+@lru_cache(maxsize=1)
+def _enc():
+    """
+    Tokenizer used to estimate how many tokens each message costs, created once
+    (cl100k_base is not Claude's tokenizer, but it is close enough for budgeting)
+    """
+    import tiktoken
+    return tiktoken.get_encoding("cl100k_base")
+
+# Old messages never change, so their token counts are remembered instead of recounted every turn
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Estimate the number of tokens in a piece of text"""
+    return len(_enc().encode(text))
+
+def trim(messages, budget=CONTEXT_BUDGET, reserve=1024):
+    """
+    Return the messages that fit in the context window, without changing the original list
+
+    Keeps the first user message (it usually sets up the conversation) and the most
+    recent messages. Older messages are dropped in assistant + user pairs so the
+    roles keep alternating.
+
+    Messages are dropped in steps of half the budget, not one pair per turn: the
+    cut point then stays the same for many turns, so the prompt cache keeps working.
+    """
+    limit = budget - reserve
+    counts = [count_tokens(m["content"]) for m in messages]
+    total = sum(counts)
+    if total <= limit:
+        return messages
+
+    # Always keep the opening user message
+    first = messages[:1] if messages[0]["role"] == "user" else []
+    start = len(first)
+
+    # Round what we must drop up to whole steps of half the budget
+    step = limit // 2
+    to_drop = -(-(total - limit) // step) * step
+
+    # Drop the oldest assistant + user pairs after the first message until that much is gone
+    dropped = 0
+    while dropped < to_drop and len(messages) - start > 2:
+        dropped += counts[start] + counts[start + 1]
+        start += 2
+
+    if total - dropped > limit:
+        print(f"\n[Warning: the latest messages alone are over the {budget:,} token budget, the request may fail]")
+
+    return first + messages[start:]
+
+# Where input() history is kept between sessions
+INPUT_HISTORY_FILE = os.path.expanduser("~/.claude_chat_history")
+
+def enable_input_history():
+    """
+    Turn on line editing and arrow-key recall for input(), remembered between sessions
+    (readline is not available on Windows, there input() works as before)
+    """
+    try:
+        import readline
+    except ImportError:
+        return
+
+    try:
+        readline.read_history_file(INPUT_HISTORY_FILE)
+    except OSError:
+        # Missing, unreadable or corrupt history file: just start with an empty history
+        pass
+    readline.set_history_length(1000)
+    atexit.register(readline.write_history_file, INPUT_HISTORY_FILE)
+
+def menu_input(prompt):
+    """input() for menu choices and yes/no answers, kept out of the chat history"""
+    answer = input(prompt)
+    try:
+        import readline
+    except ImportError:
+        return answer
+
+    # readline only records non-empty lines, so only then is there something to remove
+    if answer:
+        readline.remove_history_item(readline.get_current_history_length() - 1)
+    return answer
@@ -0,0 +1,174 @@
+# Semantic response cache used by chat.py and chat_2.py
+# If the recent conversation means (almost) the same thing as one we already answered,
+# we return the saved answer instead of calling Claude again.
+# "Semantic" means we compare meaning using embeddings, not exact text.
+
+import sqlite3
+import threading
+import time
+
+# Where the cached answers are stored
+CACHE_DB_PATH = "response_cache.db"
+
+# Small local embedding model (384 numbers per text), runs without any API
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+
+# How similar two conversations must be (1.0 = identical meaning)
+SIMILARITY_THRESHOLD = 0.97
+
+# Cached answers older than this are ignored, so they don't go stale
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Answers with a higher temperature are meant to vary, so we don't cache them
+MAX_CACHE_TEMPERATURE = 0.3
+
+# How many recent messages make up the cache key (context matters, not just the last question)
+KEY_MESSAGES = 6
+
+# Model and database are loaded once, on first use
+# (sentence-transformers and sqlite-vec are heavy, so they are only imported then too)
+_model = None
+_model_lock = threading.Lock()
+_db = None
+
+# Set when the cache fails (e.g. the model can't be downloaded), the chat then runs without it
+_disabled = False
+
+def get_model():
+    """Load the embedding model (once)"""
+    global _model
+    # The lock makes a lookup wait for a background preload() instead of loading a second copy
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(EMBEDDING_MODEL)
+    return _model
+
+def preload():
+    """
+    Start loading the embedding model in the background
+
+    Importing sentence-transformers (and torch) and downloading the model on the
+    first run takes several seconds; doing it while the user types means the
+    first message doesn't have to wait for it.
+    """
+    print("[Loading response cache in the background, start with --no-cache to skip it]")
+
+    def load():
+        try:
+            get_model()
+        except Exception as e:
+            _disable(e)
+
+    threading.Thread(target=load, daemon=True).start()
+
+def get_db():
+    """Open the cache database (once) and create the tables if needed"""
+    global _db
+    if _db is not None:
+        return _db
+
+    import sqlite_vec
+
+    db = sqlite3.connect(CACHE_DB_PATH)
+    # sqlite-vec adds vector search to SQLite
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    db.enable_load_extension(False)
+
+    db.executescript(f"""
+        CREATE TABLE IF NOT EXISTS cache (
+            id INTEGER PRIMARY KEY,
+            response TEXT NOT NULL,
+            ts REAL NOT NULL
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS cache_vectors USING vec0(
+            embedding float[{EMBEDDING_DIM}]
+        );
+    """)
+    _db = db
+    return _db
+
+def remove_expired():
+    """Delete cached answers older than the TTL"""
+    db = get_db()
+    cutoff = time.time() - CACHE_TTL_SECONDS
+    expired = [(row[0],) for row in db.execute("SELECT id FROM cache WHERE ts < ?", (cutoff,))]
+    if expired:
+        db.executemany("DELETE FROM cache_vectors WHERE rowid = ?", expired)
+        db.executemany("DELETE FROM cache WHERE id = ?", expired)
+        db.commit()
+
+def _lookup(messages, temperature):
+    """Embed the recent conversation and find the closest cached answer"""
+    if temperature > MAX_CACHE_TEMPERATURE:
+        return None, None
+
+    from sqlite_vec import serialize_float32
+
+    key_text = "\n".join(m["content"] for m in messages[-KEY_MESSAGES:])
+    # Normalized embeddings make the distance easy to turn into a cosine similarity
+    key = get_model().encode(key_text, normalize_embeddings=True).tolist()
+
+    remove_expired()
+    row = get_db().execute(
+        # "k = 1" asks for the single nearest vector (works on every SQLite version, unlike LIMIT)
+        "SELECT rowid, distance FROM cache_vectors WHERE embedding MATCH ? AND k = 1",
+        (serialize_float32(key),)
+    ).fetchone()
+    if row is None:
+        return key, None
+
+    # For normalized vectors: cosine similarity = 1 - (distance^2 / 2)
+    rowid, distance = row
+    if 1 - distance * distance / 2 < SIMILARITY_THRESHOLD:
+        return key, None
+
+    response = get_db().execute("SELECT response FROM cache WHERE id = ?", (rowid,)).fetchone()
+    return key, response[0] if response else None
+
+def _store(key, response):
+    """Save a new answer in the cache"""
+    from sqlite_vec import serialize_float32
+
+    db = get_db()
+    cursor = db.execute("INSERT INTO cache (response, ts) VALUES (?, ?)", (response, time.time()))
+    db.execute(
+        "INSERT INTO cache_vectors (rowid, embedding) VALUES (?, ?)",
+        (cursor.lastrowid, serialize_float32(key))
+    )
+    db.commit()
+
+def _disable(error):
+    """Turn the cache off for the rest of the session, with one warning"""
+    global _disabled
+    _disabled = True
+    print(f"\n[Response cache disabled: {error}]")
+
+def lookup(messages, temperature):
+    """
+    Look for a cached answer to the recent conversation
+
+    Returns (key, response):
+    - key: the embedding to pass to store() later, or None if caching doesn't apply
+    - response: the cached answer, or None on a cache miss
+
+    A broken cache never stops the chat, any error just counts as a cache miss.
+    """
+    if _disabled:
+        return None, None
+    try:
+        return _lookup(messages, temperature)
+    except Exception as e:
+        _disable(e)
+        return None, None
+
+def store(key, response):
+    """Save a new answer in the cache (does nothing if key is None, errors are ignored)"""
+    if key is None or _disabled:
+        return
+    try:
+        _store(key, response)
+    except Exception as e:
+        _disable(e)